@@ -1,9 +1,19 @@
+import hashlib
 import json  
 import os  
-import time  
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime  
 import requests  
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv  
+
+try:
+    import orjson  # optional: much faster JSON parsing and serialization
+except ImportError:
+    orjson = None
   
 # ---------------------------------------------------------------------  
 # LOAD ENVIRONMENT CONFIG  
@@ -20,6 +30,32 @@ INPUT_FOLDER = os.getenv("INPUT_FOLDER", "input")
 TEST_DATA_FOLDER = os.getenv("TEST_DATA_FOLDER", "test_data")  
 OUTPUT_FOLDER = os.getenv("OUTPUT_FOLDER", "output")  
 SCHEMA_FILE = os.getenv("SCHEMA_FILE", "schema.json")
+ANALYZER_CACHE_FILE = os.getenv("ANALYZER_CACHE_FILE", ".analyzer_cache.json")  # last deployed schema hashes
+INPUT_EXTENSIONS = frozenset({".pdf", ".docx", ".txt", ".png", ".jpg", ".jpeg", ".mp4", ".wav"})
+PRETTY_JSON = os.getenv("PRETTY_JSON") == "1"  # indent per-document result files
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "8"))  # documents analyzed concurrently
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "60"))  # seconds per HTTP call
+UPLOAD_CHUNK_SIZE = 1 << 20  # bytes read from disk per upload chunk
+POLL_INITIAL_DELAY = 0.25  # seconds before the first status re-check
+POLL_MAX_DELAY = 5.0  # upper bound for the polling backoff
+UPLOAD_RETRIES = 3  # extra attempts for an analyze upload rejected with 429/503
+
+# Shared HTTP session so every call reuses pooled TLS connections. Throttling and
+# transient server errors on idempotent calls are retried here; analyze POSTs are
+# retried on throttling only, in analyze_file_binary.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+))
+SESSION.headers.update({"Ocp-Apim-Subscription-Key": API_KEY})
+
+# Background writer so serializing result files does not hold up analysis workers
+_WRITER = ThreadPoolExecutor(max_workers=2)
+
+# Set when the run is interrupted so in-flight workers stop polling instead of finishing
+_STOP = threading.Event()
   
   
 # ---------------------------------------------------------------------  
@@ -42,9 +78,16 @@ def get_input_files():
     if not os.path.exists(INPUT_FOLDER):  
         os.makedirs(INPUT_FOLDER, exist_ok=True)  
         return []  
-    input_files = [f for f in os.listdir(INPUT_FOLDER)  
-                   if f.lower().endswith((".pdf", ".docx", ".txt", ".png", ".jpg", ".jpeg", ".mp4", ".wav"))]  
-    input_paths = [os.path.join(INPUT_FOLDER, f) for f in input_files]  
+    input_files = []
+    input_paths = []
+    # scandir yields names and full paths together with cached file type information
+    with os.scandir(INPUT_FOLDER) as entries:
+        for entry in entries:
+            # Only the suffix is lowercased, then checked with a set lookup
+            ext = os.path.splitext(entry.name)[1]
+            if ext and ext.lower() in INPUT_EXTENSIONS and entry.is_file():
+                input_files.append(entry.name)
+                input_paths.append(entry.path)
     print(f"📁 Found {len(input_files)} input files: {input_files}")  
     return input_paths   
   
@@ -58,83 +101,120 @@ def get_test_data_file(file_path):
 # ---------------------------------------------------------------------  
 # UTILS  
 # ---------------------------------------------------------------------  
+def json_loads(raw):
+    """Parse JSON from bytes or str, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def json_dumps(data, pretty=True):
+    """Serialize data to UTF-8 JSON bytes (indented or compact), using orjson when it is installed."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(data, option=option)
+    if pretty:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
 def load_json_file(path):  
     if not os.path.exists(path):  
         raise FileNotFoundError(f"File not found: {path}")  
-    with open(path, "r", encoding="utf-8") as f:  
-        return json.load(f)  
+    with open(path, "rb") as f:  
+        return json_loads(f.read())  
 
 
 def create_evaluation_run_folder():
     """Create an incrementally numbered subfolder for this evaluation run."""
-    # Find the next available run number
-    run_number = 1
-    while True:
-        run_folder = os.path.join(OUTPUT_FOLDER, f"run_{run_number:03d}")
-        if not os.path.exists(run_folder):
-            break
-        run_number += 1
+    # Find the next run number from a single listing of the output folder
+    try:
+        existing = [int(name[4:]) for name in os.listdir(OUTPUT_FOLDER)
+                    if name.startswith("run_") and name[4:].isdigit()]
+    except FileNotFoundError:
+        existing = []
+    run_number = max(existing) + 1 if existing else 1
+    run_folder = os.path.join(OUTPUT_FOLDER, f"run_{run_number:03d}")
     
     os.makedirs(run_folder, exist_ok=True)
     print(f"📁 Created evaluation run folder: {run_folder}")
     return run_folder, f"{run_number:03d}"
   
   
-def save_json(data, run_folder, filename):  
-    """Save JSON data to the evaluation run folder with specified filename."""
+def save_json(data, run_folder, filename, pretty=PRETTY_JSON):  
+    """Save JSON data to the evaluation run folder with specified filename and return its path."""
     file_path = os.path.join(run_folder, filename)  
-    with open(file_path, "w", encoding="utf-8") as f:  
-        json.dump(data, f, indent=2)  
-    print(f"💾 Saved: {file_path}")  
+    with open(file_path, "wb") as f:  
+        f.write(json_dumps(data, pretty))  
     return file_path  
 
+def _extract_time(details):
+    v = details.get("valueTime")  
+    if v and v.endswith(":00"):  
+        return v[:-3]  
+    return v  
+
+
+# Leaf field types mapped to the function that pulls out their value
+_EXTRACTORS = {
+    "string": lambda d: d.get("valueString"),
+    "number": lambda d: d.get("valueNumber"),
+    "date": lambda d: d.get("valueDate"),
+    "boolean": lambda d: d.get("valueBoolean"),
+    "integer": lambda d: d.get("valueInteger"),
+    "time": _extract_time,
+}
+
+
 def extract_actual_value(details):  
-    if not isinstance(details, dict):  
-        # Defensive: if details is already a primitive, just return it  
-        return details  
-    typ = details.get("type")  
-    if typ == "string":  
-        return details.get("valueString")  
-    elif typ == "number":  
-        return details.get("valueNumber")  
-    elif typ == "date":  
-        return details.get("valueDate")  
-    elif typ == "boolean":  
-        return details.get("valueBoolean")  
-    elif typ == "integer":  
-        return details.get("valueInteger")  
-    elif typ == "time":  
-        v = details.get("valueTime")  
-        if v and v.endswith(":00"):  
-            return v[:-3]  
-        return v  
-    elif typ == "array":  
-        arr = details.get("valueArray", [])  
-        extracted = []  
-        for item in arr:  
-            extracted.append(extract_actual_value(item))  
-        return extracted  
-    elif typ == "object":  
-        obj = details.get("valueObject", {})  
-        return {k: extract_actual_value(v) for k, v in obj.items()}  
-    else:  
-        return None  
+    """Convert an analyzer field into plain Python values, iteratively so deep nesting cannot hit the recursion limit."""
+    root = [None]
+    # Each entry is (container, key, details): the extracted value is written to container[key]
+    stack = deque([(root, 0, details)])
+    while stack:
+        parent, key, node = stack.pop()
+        if not isinstance(node, dict):
+            # Defensive: if details is already a primitive, just return it  
+            parent[key] = node
+            continue
+        typ = node.get("type")
+        if typ == "array":
+            arr = node.get("valueArray", [])
+            value = [None] * len(arr)
+            stack.extend((value, i, item) for i, item in enumerate(arr))
+        elif typ == "object":
+            obj = node.get("valueObject", {})
+            # Pre-populate keys so the result keeps the analyzer's field order
+            value = dict.fromkeys(obj)
+            stack.extend((value, k, v) for k, v in obj.items())
+        else:
+            extractor = _EXTRACTORS.get(typ)
+            value = extractor(node) if extractor else None
+        parent[key] = value
+    return root[0]
 
 # ---------------------------------------------------------------------  
 # PRICING CALCULATIONS  
 # ---------------------------------------------------------------------  
+COST_COMPONENTS = ("content_extraction", "field_extraction", "contextualization", "total")
+
+# Content Extraction (Document): $5 per 1,000 pages
+PAGE_RATE = 5.0
+
+# USD per 1M tokens by mode: (field extraction input, field extraction output, contextualization).
+# Rates stay in published units and are scaled once per document to avoid float drift.
+PRICING = {
+    # Standard: Input $2.75/1M tokens, Output $11/1M tokens, Contextualization $1/1M tokens
+    "standard": (2.75, 11.0, 1.0),
+    # Pro: Input $1.21/1M tokens, Output $4.84/1M tokens, Contextualization $1.50/1M tokens
+    "pro": (1.21, 4.84, 1.50),
+}
+
+
 def calculate_document_cost(usage_data, mode="standard"):
-    """Calculate the cost for a single document based on usage data and mode."""
-    costs = {
-        "content_extraction": 0,
-        "field_extraction": 0,
-        "contextualization": 0,
-        "total": 0
-    }
-    
-    # Content Extraction (Document): $5 per 1,000 pages
-    document_pages = usage_data.get("documentPages", 0)
-    costs["content_extraction"] = (document_pages / 1000) * 5.0
+    """Calculate the cost for a single document; returns the costs and its (input, output, contextualization) token counts."""
+    # Unknown modes are priced as standard
+    input_rate, output_rate, context_rate = PRICING.get(mode.lower(), PRICING["standard"])
     
     # Field Extraction tokens
     tokens = usage_data.get("tokens", {})
@@ -142,36 +222,25 @@ def calculate_document_cost(usage_data, mode="standard"):
     output_tokens = tokens.get("output", 0)
     contextualization_tokens = tokens.get("contextualization", 0)
     
-    # Field Extraction pricing depends on mode
-    if mode.lower() == "pro":
-        # Pro Field Extraction: Input $1.21/1M tokens, Output $4.84/1M tokens
-        costs["field_extraction"] = (input_tokens / 1000000) * 1.21 + (output_tokens / 1000000) * 4.84
-        # Pro Contextualization: $1.50/1M tokens
-        costs["contextualization"] = (contextualization_tokens / 1000000) * 1.50
-    else:
-        # Standard Field Extraction: Input $2.75/1M tokens, Output $11/1M tokens
-        costs["field_extraction"] = (input_tokens / 1000000) * 2.75 + (output_tokens / 1000000) * 11.0
-        # Standard Contextualization: $1/1M tokens
-        costs["contextualization"] = (contextualization_tokens / 1000000) * 1.0
-    
-    costs["total"] = costs["content_extraction"] + costs["field_extraction"] + costs["contextualization"]
+    content_extraction = usage_data.get("documentPages", 0) * PAGE_RATE / 1000
+    field_extraction = (input_tokens * input_rate + output_tokens * output_rate) / 1_000_000
+    contextualization = contextualization_tokens * context_rate / 1_000_000
     
-    return costs
+    costs = {
+        "content_extraction": content_extraction,
+        "field_extraction": field_extraction,
+        "contextualization": contextualization,
+        "total": content_extraction + field_extraction + contextualization
+    }
+    return costs, (input_tokens, output_tokens, contextualization_tokens)
 
 
 def aggregate_costs(document_costs):
     """Aggregate costs across all documents."""
-    totals = {
-        "content_extraction": 0,
-        "field_extraction": 0,
-        "contextualization": 0,
-        "total": 0
-    }
-    
-    for cost in document_costs:
-        for key in totals:
-            totals[key] += cost[key]
-    
+    # Sum each cost component as a column rather than updating a dict per document
+    columns = zip(*([cost[key] for key in COST_COMPONENTS] for cost in document_costs))
+    totals = dict.fromkeys(COST_COMPONENTS, 0)
+    totals.update(zip(COST_COMPONENTS, map(sum, columns)))
     return totals
 
 
@@ -180,14 +249,18 @@ def format_currency(amount):
     return f"${amount:.2f}"
 
 
+def format_status(passed):
+    """Format a field comparison result as a status icon."""
+    return "✅" if passed else "❌"
+
+
 # ---------------------------------------------------------------------  
 # ANALYZER MANAGEMENT  
 # ---------------------------------------------------------------------  
 def delete_analyzer():  
     url = f"{ENDPOINT}/contentunderstanding/analyzers/{ANALYZER_ID}?api-version={API_VERSION}"  
-    headers = {"Ocp-Apim-Subscription-Key": API_KEY}  
     print(f"🗑️ Deleting analyzer '{ANALYZER_ID}'...")  
-    resp = requests.delete(url, headers=headers)  
+    resp = SESSION.delete(url, timeout=REQUEST_TIMEOUT)  
     if resp.status_code == 204:  
         print("✅ Analyzer deleted.")  
     elif resp.status_code == 404:  
@@ -196,8 +269,8 @@ def delete_analyzer():
         print(f"⚠️ Delete failed: {resp.status_code} {resp.text}")  
   
   
-def create_analyzer():  
-    """Create analyzer using only fieldSchema from JSON file."""  
+def build_analyzer_schema():
+    """Build the analyzer definition using only fieldSchema from JSON file."""  
     schema_data = load_json_file(SCHEMA_FILE)  
     
     # Extract fieldSchema from the loaded data
@@ -216,58 +289,185 @@ def create_analyzer():
         "config": {"returnDetails": True},  
         "fieldSchema": field_schema  
     }  
-  
+    return schema
+
+
+def create_analyzer(schema):  
+    """Create analyzer from the given analyzer definition."""  
     url = f"{ENDPOINT}/contentunderstanding/analyzers/{ANALYZER_ID}?api-version={API_VERSION}"  
-    headers = {  
-        "Ocp-Apim-Subscription-Key": API_KEY,  
-        "Content-Type": "application/json"  
-    }  
+    headers = {"Content-Type": "application/json"}  
   
     print(f"🚀 Creating analyzer '{ANALYZER_ID}' in {MODE} mode...")  
-    resp = requests.put(url, headers=headers, json=schema)  
+    resp = SESSION.put(url, headers=headers, json=schema, timeout=REQUEST_TIMEOUT)  
     print(f"Status: {resp.status_code}")  
     if resp.status_code not in [200, 201]:  
         raise Exception(f"❌ Analyzer creation failed: {resp.text}")  
     print("✅ Analyzer created successfully.")  
     return schema  
+
+
+def get_analyzer_status():
+    """Return the deployed analyzer's status (e.g. "creating", "ready", "failed"), or None if it does not exist."""
+    url = f"{ENDPOINT}/contentunderstanding/analyzers/{ANALYZER_ID}?api-version={API_VERSION}"  
+    resp = SESSION.get(url, timeout=REQUEST_TIMEOUT)
+    if resp.status_code != 200:
+        return None
+    status = json_loads(resp.content).get("status")
+    return status.lower() if isinstance(status, str) else None
+
+
+def wait_for_analyzer():
+    """Poll the analyzer until it has finished creating and return its final status."""
+    delay = POLL_INITIAL_DELAY
+    while (status := get_analyzer_status()) == "creating":
+        wait_or_stop(delay)
+        delay = min(delay * 1.5, POLL_MAX_DELAY)
+    return status
+
+
+def load_analyzer_cache():
+    """Load the mapping of deployed analyzers to the hash of their definition."""
+    if not os.path.exists(ANALYZER_CACHE_FILE):
+        return {}
+    try:
+        return load_json_file(ANALYZER_CACHE_FILE)
+    except ValueError:
+        # A corrupt cache only costs a redeploy
+        return {}
+
+
+def save_analyzer_cache(cache):
+    """Persist the deployed analyzer hashes for the next run."""
+    with open(ANALYZER_CACHE_FILE, "wb") as f:
+        f.write(json_dumps(cache))
+
+
+def deploy_analyzer():
+    """Delete and recreate the analyzer, unless the deployed one already matches the current definition."""
+    schema = build_analyzer_schema()
+    # Hash the full definition, not just the schema file, so changing MODE also redeploys
+    schema_hash = hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+    cache_key = f"{ENDPOINT.rstrip('/')}/{ANALYZER_ID}"
+    cache = load_analyzer_cache()
+    # Only a ready analyzer is reused; one still creating or failed is rebuilt
+    if cache.get(cache_key) == schema_hash and get_analyzer_status() == "ready":
+        print(f"♻️ Analyzer '{ANALYZER_ID}' is unchanged since the last run; reusing it.")
+        return schema
+
+    delete_analyzer()
+    create_analyzer(schema)
+    # Record the hash only once the service confirms the analyzer is usable
+    status = wait_for_analyzer()
+    if status == "ready":
+        cache[cache_key] = schema_hash
+    else:
+        cache.pop(cache_key, None)
+    save_analyzer_cache(cache)
+    if status == "failed":
+        raise Exception(f"❌ Analyzer '{ANALYZER_ID}' failed to deploy.")
+    if status != "ready":
+        print(f"⚠️ Analyzer '{ANALYZER_ID}' reported status '{status}'; it will be recreated next run.")
+    return schema
   
   
 # ---------------------------------------------------------------------  
 # ANALYSIS  
 # ---------------------------------------------------------------------  
+class _FileChunks:
+    """Iterate a file in fixed-size chunks; a known non-zero length lets requests send a Content-Length rather than chunked encoding."""
+
+    def __init__(self, path, chunk_size=UPLOAD_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.length = os.path.getsize(path)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            while chunk := f.read(self.chunk_size):
+                yield chunk
+
+
 def analyze_file_binary(file_path):  
     url = f"{ENDPOINT}/contentunderstanding/analyzers/{ANALYZER_ID}:analyze?_overload=analyzeBinary&api-version={API_VERSION}"  
-    headers = {"Ocp-Apim-Subscription-Key": API_KEY, "Content-Type": "application/octet-stream"}  
+    # Stream the file in bounded chunks rather than buffering large media files in memory
+    body = _FileChunks(file_path)
+    headers = {
+        "Content-Type": "application/octet-stream",
+        # Explicit length keeps the streamed upload out of chunked transfer encoding
+        "Content-Length": str(len(body))
+    }  
   
     print(f"📤 Uploading {file_path}...")  
-    with open(file_path, "rb") as f:  
-        data = f.read()  
-    resp = requests.post(url, headers=headers, data=data)  
+    # requests treats a zero length as unknown and adds chunked encoding, so empty files go as plain bytes
+    data = body if len(body) else b""
+    for attempt in range(UPLOAD_RETRIES + 1):
+        resp = SESSION.post(url, headers=headers, data=data, timeout=REQUEST_TIMEOUT)  
+        # 429/503 mean the upload was rejected unprocessed, so it is safe to resend (_FileChunks re-reads the file)
+        if resp.status_code not in (429, 503) or attempt == UPLOAD_RETRIES:
+            break
+        delay = get_retry_after(resp, 2 ** attempt)
+        print(f"⏳ Upload of {os.path.basename(file_path)} throttled ({resp.status_code}); retrying in {delay:g}s...")
+        wait_or_stop(delay)
     if resp.status_code != 202:  
         raise Exception(f"❌ Analyze failed: {resp.status_code} {resp.text}")  
     op_loc = resp.headers.get("Operation-Location")  
-    print(f"Analysis started. Operation: {op_loc}")  
+    print(f"Analysis started for {os.path.basename(file_path)}. Operation: {op_loc}")  
     return op_loc  
   
   
-def poll_result(op_loc):  
-    headers = {"Ocp-Apim-Subscription-Key": API_KEY}  
+def get_retry_after(resp, default):
+    """Return the server's Retry-After delay in seconds, never shorter than default."""
+    retry_after = resp.headers.get("Retry-After")
+    try:
+        return max(float(retry_after), default)
+    except (TypeError, ValueError):
+        # Header missing or given as an HTTP date
+        return default
+
+
+def wait_or_stop(seconds):
+    """Sleep between API calls, giving up early if the run has been interrupted."""
+    if _STOP.wait(seconds):
+        raise Exception("❌ Run cancelled.")
+
+
+def poll_result(op_loc, doc_name):  
+    # Start polling quickly and back off exponentially, deferring to Retry-After when given
+    delay = POLL_INITIAL_DELAY
     while True:  
-        resp = requests.get(op_loc, headers=headers)  
-        data = resp.json()  
+        resp = SESSION.get(op_loc, timeout=REQUEST_TIMEOUT)  
+        resp.raise_for_status()
+        data = json_loads(resp.content)  
         status = data.get("status")  
         if status == "Succeeded":  
-            print("✅ Analysis complete.")  
+            print(f"✅ Analysis complete: {doc_name}")  
             return data  
         elif status == "Failed":  
             raise Exception("❌ Analysis failed.")  
-        print("⏳ Waiting...")  
-        time.sleep(3)  
+        print(f"⏳ Waiting for {doc_name}...")  
+        wait_or_stop(get_retry_after(resp, delay))
+        delay = min(delay * 1.5, POLL_MAX_DELAY)
   
   
 # ---------------------------------------------------------------------  
 # EVALUATION  
 # ---------------------------------------------------------------------  
+def normalize_value(value):
+    """Normalize a field value for case- and whitespace-insensitive comparison."""
+    return value if value is None else str(value).strip().casefold()
+
+
+def values_match(expected, actual):
+    """Compare an expected and extracted value, skipping normalization when they are already equal."""
+    # Require matching types so e.g. True and 1 are not treated as equal
+    if type(expected) is type(actual) and expected == actual:
+        return True
+    return normalize_value(expected) == normalize_value(actual)
+
+
 def compare_results_to_testdata(result, testdata):  
     extracted_fields = result["result"]["contents"][0].get("fields", {})  
     success, total = 0, 0  
@@ -276,11 +476,9 @@ def compare_results_to_testdata(result, testdata):
         expected = testdata.get(field)  
         actual = extract_actual_value(details)
         total += 1  
-        if str(expected).strip().lower() == str(actual).strip().lower():  
-            success += 1  
-            field_scores[field] = {"status": "✅", "expected": expected, "actual": actual}  
-        else:  
-            field_scores[field] = {"status": "❌", "expected": expected, "actual": actual}  
+        passed = values_match(expected, actual)
+        success += passed
+        field_scores[field] = {"passed": passed, "expected": expected, "actual": actual}  
     accuracy = round((success / total) * 100, 2) if total else 0  
     return accuracy, field_scores  
   
@@ -290,7 +488,7 @@ def aggregate_field_performance(results):
     for item in results:  
         for field, detail in item["fields"].items():  
             agg.setdefault(field, {"passes": 0, "fails": 0})  
-            if detail["status"] == "✅":  
+            if detail["passed"]:  
                 agg[field]["passes"] += 1  
             else:  
                 agg[field]["fails"] += 1  
@@ -307,24 +505,34 @@ def generate_evaluation_report(run_folder, run_number, results, field_performanc
     report_path_md = os.path.join(run_folder, "evaluation_report.md")
     report_path_json = os.path.join(run_folder, "evaluation_report.json")
     
-    # Calculate overall statistics
+    # Read the clock once so the JSON and markdown reports carry the same time
+    now = datetime.now()
+    timestamp = now.strftime('%Y%m%d_%H%M%S')
+    date = now.strftime('%Y-%m-%d %H:%M:%S')
+    
+    # Calculate per-document and overall statistics in a single pass over the results
     total_docs = len(results) if results else len(all_costs)
-    total_fields_tested = sum(len(item["fields"]) for item in results) if results else 0
-    total_field_passes = sum(1 for item in results for field, detail in item["fields"].items() if detail["status"] == "✅") if results else 0
+    doc_stats = []
+    total_fields_tested = 0
+    total_field_passes = 0
+    for item in results:
+        fields_count = len(item["fields"])
+        doc_passes = sum(detail["passed"] for detail in item["fields"].values())
+        doc_stats.append((item["doc"], fields_count, doc_passes))
+        total_fields_tested += fields_count
+        total_field_passes += doc_passes
     overall_accuracy = round((total_field_passes / total_fields_tested) * 100, 2) if total_fields_tested > 0 else 0
     
     # Calculate aggregate costs
-    aggregate_cost = aggregate_costs([cost_data["costs"] for cost_data in all_costs]) if all_costs else {
-        "content_extraction": 0, "field_extraction": 0, "contextualization": 0, "total": 0
-    }
+    aggregate_cost = aggregate_costs([cost_data["costs"] for cost_data in all_costs])
     
     # Create comprehensive JSON report structure
     json_report = {
         "metadata": {
             "run_id": f"run_{run_number}",
             "run_number": int(run_number),
-            "timestamp": datetime.now().strftime('%Y%m%d_%H%M%S'),
-            "date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "timestamp": timestamp,
+            "date": date,
             "analyzer_id": ANALYZER_ID,
             "mode": MODE,
             "schema_file": SCHEMA_FILE
@@ -342,22 +550,28 @@ def generate_evaluation_report(run_folder, run_number, results, field_performanc
             "mode": MODE
         },
         "results": {
-            "document_level": results,
+            # The viewer keys off the status icon, so render it alongside the boolean
+            "document_level": [
+                {"doc": item["doc"], "fields": {field: {"status": format_status(detail["passed"]), **detail}
+                                                for field, detail in item["fields"].items()}}
+                for item in results
+            ],
             "field_performance": field_performance
         },
         "analyzer_config": analyzer_config
     }
     
     # Save JSON report
-    with open(report_path_json, "w", encoding="utf-8") as f:
-        json.dump(json_report, f, indent=2, ensure_ascii=False)
+    with open(report_path_json, "wb") as f:
+        f.write(json_dumps(json_report))
     print(f"📊 Generated JSON report: {report_path_json}")
     
-    # Generate markdown content
-    content = f"""# Document Analyzer Evaluation Report
+    # Generate markdown content; collect parts and join once to avoid quadratic string building
+    parts = []
+    parts.append(f"""# Document Analyzer Evaluation Report
 
 **Evaluation Run ID:** run_{run_number}  
-**Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  
+**Date:** {date}  
 **Analyzer ID:** {ANALYZER_ID}  
 **Mode:** {MODE}  
 **Schema:** {SCHEMA_FILE}  
@@ -384,71 +598,73 @@ def generate_evaluation_report(run_folder, run_number, results, field_performanc
 
 | Document | Pages | Input Tokens | Output Tokens | Context Tokens | Cost |
 |----------|-------|--------------|---------------|----------------|------|
-"""
+""")
     
-    # Add per-document cost breakdown
+    # Add per-document cost breakdown, noting each result file name for the file list below
+    result_files = []
     for cost_data in all_costs:
         doc_name = cost_data["document"]
+        result_files.append((os.path.splitext(doc_name)[0], doc_name))
         usage = cost_data["usage"]
         cost = cost_data["costs"]
         tokens = usage.get("tokens", {})
         
-        content += f"| {doc_name} | {usage.get('documentPages', 0)} | {tokens.get('input', 0):,} | {tokens.get('output', 0):,} | {tokens.get('contextualization', 0):,} | {format_currency(cost['total'])} |\n"
+        parts.append(f"| {doc_name} | {usage.get('documentPages', 0)} | {tokens.get('input', 0):,} | {tokens.get('output', 0):,} | {tokens.get('contextualization', 0):,} | {format_currency(cost['total'])} |\n")
     
     # Add pricing information
-    content += f"""
+    parts.append(f"""
 
 ### Pricing Details ({MODE.title()} Mode)
 
 **Content Extraction:** $5.00 per 1,000 pages  
-**Field Extraction:**"""
+**Field Extraction:**""")
     
     if MODE.lower() == "pro":
-        content += """
+        parts.append("""
 - Input tokens: $1.21 per 1M tokens
 - Output tokens: $4.84 per 1M tokens
 
-**Contextualization:** $1.50 per 1M tokens"""
+**Contextualization:** $1.50 per 1M tokens""")
     else:
-        content += """
+        parts.append("""
 - Input tokens: $2.75 per 1M tokens  
 - Output tokens: $11.00 per 1M tokens
 
-**Contextualization:** $1.00 per 1M tokens"""
+**Contextualization:** $1.00 per 1M tokens""")
 
     # Only add accuracy sections if we have evaluation results
     if results:
-        content += "\n## Document-Level Results\n\n| Document | Fields Tested | Accuracy | Pass | Fail |\n|----------|---------------|----------|------|------|\n"
+        parts.append("\n## Document-Level Results\n\n| Document | Fields Tested | Accuracy | Pass | Fail |\n|----------|---------------|----------|------|------|\n")
         
         # Add document-level results
-        for item in results:
-            doc_name = item["doc"]
-            fields_count = len(item["fields"])
-            doc_passes = sum(1 for detail in item["fields"].values() if detail["status"] == "✅")
+        for doc_name, fields_count, doc_passes in doc_stats:
             doc_accuracy = round((doc_passes / fields_count) * 100, 2) if fields_count > 0 else 0
             doc_fails = fields_count - doc_passes
-            content += f"| {doc_name} | {fields_count} | {doc_accuracy}% | {doc_passes} | {doc_fails} |\n"
+            parts.append(f"| {doc_name} | {fields_count} | {doc_accuracy}% | {doc_passes} | {doc_fails} |\n")
         
         # Add field-level performance
-        content += "\n## Field-Level Performance\n\n| Field | Total Tests | Accuracy | Passes | Failures |\n|-------|-------------|----------|--------|---------|\n"
+        parts.append("\n## Field-Level Performance\n\n| Field | Total Tests | Accuracy | Passes | Failures |\n|-------|-------------|----------|--------|---------|\n")
         
         for field, data in field_performance.items():
             total = data["passes"] + data["fails"]
             accuracy = round((data["passes"] / total) * 100, 2) if total > 0 else 0
-            content += f"| {field} | {total} | {accuracy}% | {data['passes']} | {data['fails']} |\n"
+            parts.append(f"| {field} | {total} | {accuracy}% | {data['passes']} | {data['fails']} |\n")
         
         # Add detailed field results per document
-        content += "\n## Detailed Results by Document\n\n"
+        parts.append("\n## Detailed Results by Document\n\n")
         
+        detail_header = "| Field | Expected | Actual | Status |\n|-------|----------|--------|--------|\n"
         for item in results:
-            content += f"### {item['doc']}\n\n| Field | Expected | Actual | Status |\n|-------|----------|--------|--------|\n"
-            for field, detail in item["fields"].items():
-                status_icon = "✅" if detail["status"] == "✅" else "❌"
-                content += f"| {field} | {detail['expected']} | {detail['actual']} | {status_icon} |\n"
-            content += "\n"
+            parts.append(f"### {item['doc']}\n\n")
+            parts.append(detail_header)
+            parts.extend([
+                f"| {field} | {detail['expected']} | {detail['actual']} | {format_status(detail['passed'])} |\n"
+                for field, detail in item["fields"].items()
+            ])
+            parts.append("\n")
     
     # Add analyzer configuration section
-    content += f"""
+    parts.append(f"""
 ## Analyzer Configuration
 
 ```json
@@ -461,29 +677,81 @@ This evaluation run generated the following files:
 
 - `evaluation_report.md` - This comprehensive markdown report
 - `evaluation_report.json` - Machine-readable JSON report for tooling/viewers
-"""
+""")
     
     # List all JSON files in the run folder
-    for cost_data in all_costs:
-        base_name = os.path.splitext(cost_data["document"])[0]
-        content += f"- `{base_name}.json` - Analysis results for {cost_data['document']}\n"
+    for base_name, doc_name in result_files:
+        parts.append(f"- `{base_name}.json` - Analysis results for {doc_name}\n")
     
     # Save the report
     with open(report_path_md, "w", encoding="utf-8") as f:
-        f.write(content)
+        f.write("".join(parts))
     
     print(f"📊 Generated markdown report: {report_path_md}")
     return report_path_json, report_path_md  
   
   
+def evaluate_result(file_path, result):
+    """Compare a document's result to its test data; returns the evaluation entry, or None without test data."""
+    doc_name = os.path.basename(file_path)
+    test_file = get_test_data_file(file_path)  
+    if not test_file:
+        print(f"ℹ️ No test data found for {doc_name}")  
+        return None
+
+    test_data = load_json_file(test_file)  
+    accuracy, field_scores = compare_results_to_testdata(result, test_data)  
+    # Print the per-field breakdown in one call so it stays together while other workers log
+    lines = [f"📊 {doc_name} accuracy: {accuracy}%"]
+    lines.extend(
+        f"  {field}: {format_status(detail['passed'])} (expected '{detail['expected']}' vs actual '{detail['actual']}')"
+        for field, detail in field_scores.items()
+    )
+    print("\n".join(lines))
+    return {"doc": doc_name, "fields": field_scores}
+
+
+def process_one(file_path, run_folder):
+    """Analyze, cost, save and evaluate one document.
+
+    Returns (cost entry, evaluation entry or None, save future, evaluation error or None).
+    """
+    doc_name = os.path.basename(file_path)
+    print(f"\n📄 Processing: {doc_name}")  
+    op_loc = analyze_file_binary(file_path)  
+    result = poll_result(op_loc, doc_name)  
+    
+    # Calculate costs from usage data
+    usage_data = result.get("usage", {})
+    document_cost, token_counts = calculate_document_cost(usage_data, MODE)
+    cost_entry = {
+        "document": doc_name,
+        "usage": usage_data,
+        "costs": document_cost
+    }
+    print(f"💰 {doc_name} cost: {format_currency(document_cost['total'])} (Pages: {usage_data.get('documentPages', 0)}, Tokens: {sum(token_counts)})")
+    
+    # Save with matching filename (no timestamp prefix)
+    base_name = os.path.splitext(doc_name)[0]
+    result_filename = f"{base_name}.json"
+    saved = _WRITER.submit(save_json, result, run_folder, result_filename)
+
+    # The document is billed from here on, so an evaluation error must not discard its cost
+    try:
+        result_entry = evaluate_result(file_path, result)
+    except Exception as e:
+        print(f"❌ Evaluating {doc_name} failed: {e}")
+        return cost_entry, None, saved, e
+    return cost_entry, result_entry, saved, None
+
+
 # ---------------------------------------------------------------------  
 # MAIN WORKFLOW  
 # ---------------------------------------------------------------------  
 if __name__ == "__main__":  
     print("\n🔧 Initialising Azure CU Document Analyzer Evaluator")  
     validate_environment()  
-    delete_analyzer()  
-    analyzer_config = create_analyzer()  
+    analyzer_config = deploy_analyzer()
     
     # Create evaluation run folder
     run_folder, run_number = create_evaluation_run_folder()
@@ -493,38 +761,49 @@ if __name__ == "__main__":
         print(f"❌ No input files found in '{INPUT_FOLDER}'. Exiting.")  
         exit(0)
   
+    outcomes = {}
+    failures = []  # Documents whose analysis failed
+    unsaved = []  # Documents analyzed but whose result file could not be written
+    unevaluated = []  # Documents analyzed but whose comparison to test data raised
     all_results = []  
     all_costs = []  # Track costs for each document
-    for file_path in input_files:  
-        print(f"\n📄 Processing: {os.path.basename(file_path)}")  
-        op_loc = analyze_file_binary(file_path)  
-        result = poll_result(op_loc)  
-        
-        # Calculate costs from usage data
-        usage_data = result.get("usage", {})
-        document_cost = calculate_document_cost(usage_data, MODE)
-        all_costs.append({
-            "document": os.path.basename(file_path),
-            "usage": usage_data,
-            "costs": document_cost
-        })
-        print(f"💰 Cost: {format_currency(document_cost['total'])} (Pages: {usage_data.get('documentPages', 0)}, Tokens: {sum(usage_data.get('tokens', {}).values())})")
-        
-        # Save with matching filename (no timestamp prefix)
-        base_name = os.path.splitext(os.path.basename(file_path))[0]
-        result_filename = f"{base_name}.json"
-        save_json(result, run_folder, result_filename)
-  
-        test_file = get_test_data_file(file_path)  
-        if test_file:  
-            test_data = load_json_file(test_file)  
-            accuracy, field_scores = compare_results_to_testdata(result, test_data)  
-            print(f"📊 Accuracy: {accuracy}%")  
-            for field, detail in field_scores.items():  
-                print(f"  {field}: {detail['status']} (expected '{detail['expected']}' vs actual '{detail['actual']}')")  
-            all_results.append({"doc": os.path.basename(file_path), "fields": field_scores})  
-        else:  
-            print(f"ℹ️ No test data found for {os.path.basename(file_path)}")  
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    try:
+        futures = {executor.submit(process_one, file_path, run_folder): file_path for file_path in input_files}
+        for future in as_completed(futures):
+            file_path = futures[future]
+            # Log and carry on so one bad document does not discard the rest of the run
+            try:
+                outcomes[file_path] = future.result()
+            except Exception as e:
+                failures.append(os.path.basename(file_path))
+                print(f"❌ {os.path.basename(file_path)} failed: {e}")
+        executor.shutdown(wait=True)
+
+        # Collect in input order so reports are stable regardless of completion order
+        for file_path in input_files:
+            if file_path not in outcomes:
+                continue
+            cost_entry, result_entry, saved, evaluation_error = outcomes[file_path]
+            if evaluation_error is not None:
+                unevaluated.append(os.path.basename(file_path))
+            # Report the background save here on the main thread, so it cannot interleave with worker output
+            try:
+                print(f"💾 Saved: {saved.result()}")
+            except Exception as e:
+                unsaved.append(os.path.basename(file_path))
+                print(f"❌ Saving results for {os.path.basename(file_path)} failed: {e}")
+            # The analysis was billed even if saving or evaluation failed, so always keep its cost
+            all_costs.append(cost_entry)
+            if result_entry:
+                all_results.append(result_entry)
+        _WRITER.shutdown(wait=True)
+    except BaseException:
+        # On Ctrl-C (or any abort) never start queued documents, and make in-flight ones stop polling
+        _STOP.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        _WRITER.shutdown(wait=False, cancel_futures=True)
+        raise
   
     if all_results:  
         field_performance = aggregate_field_performance(all_results)
@@ -546,5 +825,15 @@ if __name__ == "__main__":
         else:
             print("ℹ️ No test data available for evaluation - skipping report generation")
   
+    if failures or unsaved or unevaluated:
+        if failures:
+            print(f"\n⚠️ {len(failures)} document(s) failed and are not in the report: {', '.join(failures)}")
+        if unevaluated:
+            print(f"\n⚠️ Could not evaluate against test data (costs still included): {', '.join(unevaluated)}")
+        if unsaved:
+            print(f"\n⚠️ Result files could not be saved for: {', '.join(unsaved)}")
+        print(f"Results for the remaining documents saved to: {run_folder}")
+        exit(1)
+
     print(f"\n✅ Evaluation completed. Results saved to: {run_folder}")
     print("✅ Done.")  
\ No newline at end of file